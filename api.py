@@ -2,16 +2,40 @@
 
 from fastapi import FastAPI, HTTPException, Header, Depends
 from pydantic import BaseModel
-from langchain.chains import RetrievalQA
 from model_cache import ModelCache
 from response_cache import response_cache
 from bucket_index import bucket_index
-from utils import logger, timing_decorator, search_in_fallback_text, load_txt_documents
+from semantic_cache import semantic_cache
+from utils import (
+    logger,
+    timing_decorator,
+    search_in_fallback_text,
+    load_txt_documents,
+    QUICK_PROMPT,
+    FALLBACK_PROMPT,
+)
 from config import VECTOR_SEARCH_K, API_KEY, CORS_ORIGINS
 import time
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
+_NEWLINES_TO_SPACES = str.maketrans("\n", " ")
+
+# Prompt template, filled with % so the long literal is not rebuilt per call
+_VECTOR_PROMPT = """You are a technical documentation assistant. Using the information from technical documents below, provide a clear, step-by-step answer to the user's question.
+
+Please provide:
+1. A direct answer to the question
+2. Step-by-step instructions if applicable
+3. Any important configuration details
+4. Relevant commands or API calls
+
+%s
+
+The user asked: "%s"
+
+Answer:"""
+
 app = FastAPI(title="S3 On-Prem AI Assistant API - Lightning Fast", version="2.3.0")
 
 # CORS
@@ -34,6 +58,12 @@ class QueryResponse(BaseModel):
     response_time: float
 
 
+def _source_filename(doc) -> str:
+    """File name of a retrieved document's source path"""
+    src = doc.metadata.get("source", "unknown")
+    return src.split("\\")[-1].split("/")[-1]
+
+
 def verify_api_key(x_api_key: str | None = Header(default=None)):
     if API_KEY:
         if not x_api_key or x_api_key != API_KEY:
@@ -53,16 +83,10 @@ async def startup_event():
     preload_vector = os.getenv("PRELOAD_VECTOR", "0").lower() in ("1", "true", "yes")
     if preload_vector:
         try:
-            # Load vector store directly to avoid threading issues
-            from langchain_community.embeddings import HuggingFaceEmbeddings
-            from langchain_community.vectorstores import FAISS
-            from config import VECTOR_INDEX_PATH, EMBED_MODEL
-
-            embeddings = HuggingFaceEmbeddings(
-                model_name=EMBED_MODEL, model_kwargs={"device": "cpu"}
-            )
-            FAISS.load_local(VECTOR_INDEX_PATH, embeddings)
-            logger.info("Vector store preloaded successfully")
+            if ModelCache.get_vector_store() is not None:
+                logger.info("Vector store preloaded successfully")
+            else:
+                logger.warning("Vector store preload failed (see log above)")
         except Exception as e:
             logger.warning(f"Vector store preload failed: {e}")
     else:
@@ -71,6 +95,16 @@ async def startup_event():
     logger.info("Startup initialization completed")
 
 
+@app.on_event("shutdown")
+def shutdown_event():
+    """Persist the semantic question index"""
+    if semantic_cache is not None:
+        try:
+            semantic_cache.save()
+        except Exception as e:
+            logger.warning(f"Semantic cache save failed: {e}")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -100,19 +134,13 @@ def ask_question(req: QueryRequest):
         quick_result = bucket_index.quick_search(question)
         if quick_result:
             llm = ModelCache.get_llm()
-            prompt = f"""Based on this bucket information:
-{quick_result}
-
-Question: {question}
-Answer:"""
+            prompt = QUICK_PROMPT % (quick_result, question)
 
             try:
                 import concurrent.futures
-                from config import LLM_TIMEOUT_SECONDS
+                from utils import call_llm_with_retry
 
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                    fut = ex.submit(llm, prompt)
-                    answer = fut.result(timeout=LLM_TIMEOUT_SECONDS)
+                answer = call_llm_with_retry("api_quick_search", llm, prompt)
                 response_cache.set(question, answer, "quick_search")
                 return QueryResponse(
                     answer=answer,
@@ -134,42 +162,39 @@ Answer:"""
                     response_time=time.time() - start_time,
                 )
 
+        # Paraphrase of an earlier question whose answer is still cached
+        if semantic_cache is not None:
+            try:
+                similar_response = semantic_cache.get(question)
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {e}")
+                similar_response = None
+            if similar_response:
+                return QueryResponse(
+                    answer=similar_response,
+                    source="semantic_cache",
+                    response_time=time.time() - start_time,
+                )
+
         # Vector search fallback
         try:
-            # Load vector store directly to avoid threading issues
-            from langchain_community.embeddings import HuggingFaceEmbeddings
-            from langchain_community.vectorstores import FAISS
-            from config import VECTOR_INDEX_PATH, EMBED_MODEL
-
-            embeddings = HuggingFaceEmbeddings(
-                model_name=EMBED_MODEL, model_kwargs={"device": "cpu"}
-            )
-            vector_store = FAISS.load_local(VECTOR_INDEX_PATH, embeddings)
+            vector_store = ModelCache.get_vector_store()
             if vector_store is None:
                 raise RuntimeError(
                     "Vector store not available - please run 'python build_embeddings_all.py' after uploading documents"
                 )
-            retriever = vector_store.as_retriever(search_kwargs={"k": VECTOR_SEARCH_K})
-            docs = retriever.get_relevant_documents(question)
+            # embed_query is memoized, so this reuses the semantic-cache vector
+            query_vector = ModelCache.get_embeddings().embed_query(question)
+            docs = vector_store.similarity_search_by_vector(
+                query_vector, k=VECTOR_SEARCH_K
+            )
 
             if docs:
                 # Try LLM processing with fallback
                 try:
                     # Method 1: Try direct LLM call with shorter context
-                    context = "\n\n".join([d.page_content[:600] for d in docs])
-                    prompt = f"""You are a technical documentation assistant. The user asked: "{question}"
-
-Based on this information from technical documents, provide a clear, step-by-step answer:
-
-{context}
-
-Please provide:
-1. A direct answer to the question
-2. Step-by-step instructions if applicable  
-3. Any important configuration details
-4. Relevant commands or API calls
-
-Answer:"""
+                    context = "\n\n".join(d.page_content[:600] for d in docs)
+                    prompt = _VECTOR_PROMPT % (context, question)
 
                     llm = ModelCache.get_llm()
                     result = llm.invoke(prompt)
@@ -190,18 +215,11 @@ Answer:"""
                     )
 
                     # Fallback: Format document snippets for better readability
-                    from text_formatter import smart_format_text
-
-                    snippets = []
-                    for i, doc in enumerate(docs, 1):
-                        src = doc.metadata.get("source", "unknown")
-                        filename = src.split("\\")[-1].split("/")[-1]
-                        content = smart_format_text(doc.page_content, max_length=600)
-                        snippets.append(
-                            f" Document {i}: {filename}\n{'-' * 60}\n{content}...\n"
-                        )
-
-                    result = "\n".join(snippets)
+                    result = "\n".join(
+                        f" Document {i}: {_source_filename(doc)}\n{'-' * 60}\n"
+                        f"{doc.page_content[:600].translate(_NEWLINES_TO_SPACES)}...\n"
+                        for i, doc in enumerate(docs, 1)
+                    )
                     response_cache.set(question, result, "vector_snippets_fallback")
                     return QueryResponse(
                         answer=f"Found {len(docs)} relevant documents (LLM processing failed):\n\n{result}",
@@ -221,11 +239,7 @@ Answer:"""
 
                 if relevant_context:
                     llm = ModelCache.get_llm()
-                    prompt = f"""Based on this information:
-{relevant_context}
-
-Question: {question}
-Answer:"""
+                    prompt = FALLBACK_PROMPT % (relevant_context, question)
 
                     try:
                         result = llm(prompt)
@@ -271,6 +285,8 @@ async def clear_cache():
 async def clear_all_cache():
     """Clear all cache entries"""
     response_cache.clear_all()
+    if semantic_cache is not None:
+        semantic_cache.clear()
     return {"message": "All cache cleared successfully"}
 
 
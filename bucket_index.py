@@ -9,7 +9,18 @@ from config import (
     QUICK_SEARCH_MAX_RESULTS,
     QUICK_SEARCH_ENABLE_KEYWORD_FALLBACK,
 )
-from utils import logger
+from utils import logger, FallbackTextIndex
+
+# Compiled once; quick_search runs on every submitted query
+_DEPT_RE = re.compile(r'dept(?:artment)?\s*:?\s*"?([\w\-\s]+)"?')
+_LABEL_RE = re.compile(r'label\s*:?\s*"?([\w\-:\.]+)"?')
+_NAME_RE = re.compile(r'(?:bucket|name)\s*:?\s*"?([a-zA-Z0-9_\-\.]+)"?')
+_BUCKET_QUERY_RES = (
+    re.compile(r"\bdept(?:artment)?\s*:"),
+    re.compile(r"\blabel\s*:"),
+    re.compile(r"\bbucket(?:\s*name)?\s*:"),
+)
+_KEYWORD_RE = re.compile(r"\b([\w\-:\.]+)\b")
 
 
 class BucketIndex:
@@ -18,6 +29,7 @@ class BucketIndex:
         self.label_index = defaultdict(list)
         self.name_index = defaultdict(list)
         self.all_lines = []
+        self._text_index = FallbackTextIndex("")  # Keyword search over all_lines
         self.enabled = bool(FLATTENED_TXT_PATH)
         self.build_index()
 
@@ -33,10 +45,6 @@ class BucketIndex:
             self.enabled = False
             return
 
-        dept_pattern = re.compile(r'dept(?:artment)?\s*:?\s*"?([\w\-\s]+)"?')
-        label_pattern = re.compile(r'label\s*:?\s*"?([\w\-:\.]+)"?')
-        name_pattern = re.compile(r'(?:bucket|name)\s*:?\s*"?([a-zA-Z0-9_\-\.]+)"?')
-
         try:
             with open(txt_file, "r", encoding="utf-8") as f:
                 for line_num, line in enumerate(f, 1):
@@ -48,17 +56,22 @@ class BucketIndex:
                     line_lower = line.lower()
 
                     # Index departments
-                    for dept in dept_pattern.findall(line_lower):
+                    for dept in _DEPT_RE.findall(line_lower):
                         self.dept_index[dept.strip()].append((line_num, line))
 
                     # Index labels
-                    for label in label_pattern.findall(line_lower):
+                    for label in _LABEL_RE.findall(line_lower):
                         self.label_index[label.strip()].append((line_num, line))
 
                     # Index bucket names
-                    for name in name_pattern.findall(line_lower):
+                    for name in _NAME_RE.findall(line_lower):
                         self.name_index[name.strip()].append((line_num, line))
 
+            # Stripped lines hold no newlines, so index line i is all_lines[i]
+            self._text_index = FallbackTextIndex(
+                "\n".join(line for _, line in self.all_lines)
+            )
+
             logger.info(
                 f"Bucket index built: {len(self.all_lines)} lines, "
                 f"{len(self.dept_index)} departments, "
@@ -80,13 +93,13 @@ class BucketIndex:
         """Search buckets by name"""
         return self.name_index.get(name.lower(), [])
 
+    def search_keyword(self, keyword: str, limit: int) -> list:
+        """(line_num, line) pairs for lines containing keyword"""
+        return [self.all_lines[i] for i in self._text_index.find_lines(keyword, limit)]
+
     def _is_bucket_query(self, query_lower: str) -> bool:
         """Heuristic: only treat as bucket query if explicit bucket metadata hints exist (requires colon)."""
-        return (
-            re.search(r"\bdept(?:artment)?\s*:", query_lower) is not None
-            or re.search(r"\blabel\s*:", query_lower) is not None
-            or re.search(r"\bbucket(?:\s*name)?\s*:", query_lower) is not None
-        )
+        return any(pattern.search(query_lower) for pattern in _BUCKET_QUERY_RES)
 
     def quick_search(self, query: str) -> str:
         """Fast search for common bucket queries. Only triggers for explicit bucket metadata patterns."""
@@ -101,7 +114,7 @@ class BucketIndex:
         results = []
 
         # Department search
-        dept_match = re.search(r'dept(?:artment)?\s*:?\s*"?([\w\-\s]+)"?', query_lower)
+        dept_match = _DEPT_RE.search(query_lower)
         if dept_match:
             dept = dept_match.group(1)
             dept_results = self.search_by_dept(dept)
@@ -109,7 +122,7 @@ class BucketIndex:
                 results.extend(dept_results)
 
         # Label search
-        label_match = re.search(r'label\s*:?\s*"?([\w\-:\.]+)"?', query_lower)
+        label_match = _LABEL_RE.search(query_lower)
         if label_match:
             label = label_match.group(1)
             label_results = self.search_by_label(label)
@@ -118,14 +131,10 @@ class BucketIndex:
 
         # Keyword fallback only if explicitly enabled and we already determined it's a bucket query
         if not results and QUICK_SEARCH_ENABLE_KEYWORD_FALLBACK:
-            keywords = re.findall(r"\b([\w\-:\.]+)\b", query_lower)
+            keywords = _KEYWORD_RE.findall(query_lower)
             for keyword in keywords:
                 if len(keyword) > 2:  # Skip short words
-                    for line_num, line in self.all_lines:
-                        if keyword in line.lower():
-                            results.append((line_num, line))
-                            if len(results) >= QUICK_SEARCH_MAX_RESULTS:
-                                break
+                    results = self.search_keyword(keyword, QUICK_SEARCH_MAX_RESULTS)
                     if results:
                         break
 
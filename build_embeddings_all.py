@@ -19,9 +19,39 @@ from config import (
     CHUNK_OVERLAP,
     EMBED_DEVICE,
     EMBED_BATCH_SIZE,
+    FAISS_INDEX_TYPE,
+    FAISS_HNSW_M,
+    FAISS_HNSW_EF_SEARCH,
 )
 
 
+def convert_index(index, index_type: str):
+    """Re-encode a flat FAISS index into a smaller/faster index type"""
+    import faiss
+
+    vectors = index.reconstruct_n(0, index.ntotal)
+    if index_type == "sq8":
+        # int8 scalar quantization: 4x less memory bandwidth, ~1% recall loss
+        converted = faiss.IndexScalarQuantizer(
+            index.d, faiss.ScalarQuantizer.QT_8bit, index.metric_type
+        )
+    elif index_type == "hnsw":
+        # Approximate graph search: sublinear query time on large corpora
+        converted = faiss.IndexHNSWFlat(index.d, FAISS_HNSW_M, index.metric_type)
+    elif index_type == "hnsw_sq8":
+        converted = faiss.IndexHNSWSQ(
+            index.d, faiss.ScalarQuantizer.QT_8bit, FAISS_HNSW_M, index.metric_type
+        )
+    else:
+        raise ValueError(f"Unsupported FAISS_INDEX_TYPE: {index_type}")
+    if index_type.startswith("hnsw"):
+        # efSearch is saved with the index, so query time needs no extra setup
+        converted.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+    converted.train(vectors)
+    converted.add(vectors)
+    return converted
+
+
 @timing_decorator
 def build_vector_index():
     logger.info("=== Starting vector index build ===")
@@ -91,6 +121,15 @@ def build_vector_index():
         logger.error(f"Failed to create FAISS vector store: {e}")
         return False
 
+    if FAISS_INDEX_TYPE != "flat":
+        logger.info(f"Converting FAISS index to '{FAISS_INDEX_TYPE}'...")
+        try:
+            vector_store.index = convert_index(vector_store.index, FAISS_INDEX_TYPE)
+            logger.info("FAISS index converted successfully")
+        except Exception as e:
+            logger.error(f"Failed to convert FAISS index: {e}")
+            return False
+
     # Ensure directory exists
     os.makedirs(VECTOR_INDEX_PATH, exist_ok=True)
 
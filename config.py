@@ -16,17 +16,46 @@ FLATTENED_TXT_PATH = os.getenv("FLATTENED_TXT_PATH", "")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 EMBED_DEVICE = os.getenv("EMBED_DEVICE", "cpu")
 EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Memoized query embeddings per process (repeat questions skip the encoder)
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
 
 # Performance settings
 VECTOR_SEARCH_K = int(os.getenv("VECTOR_SEARCH_K", "3"))  # Reduced from 5 for speed
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))  # Reduced from 1000
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))  # Reduced from 200
 CACHE_TTL_HOURS = int(os.getenv("CACHE_TTL_HOURS", "24"))
+CACHE_MEMORY_ENTRIES = int(
+    os.getenv("CACHE_MEMORY_ENTRIES", "512")
+)  # In-process LRU in front of the disk cache (0 disables)
+# Atomic temp-file + rename cache writes; off by default since entries are disposable
+CACHE_DURABLE = os.getenv("CACHE_DURABLE", "false").lower() in ("1", "true", "yes")
+# Serve cached answers to paraphrased questions (cosine similarity of query embeddings)
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "4096"))
 LLM_TIMEOUT_SECONDS = int(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+# Opt-in hedging: re-issue an LLM call that runs past its recent p95 latency (within
+# LLM_TIMEOUT_SECONDS). Off by default since every hedge is extra work for Ollama
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
 VECTOR_LOAD_TIMEOUT_SECONDS = int(
     os.getenv("VECTOR_LOAD_TIMEOUT_SECONDS", "120")
 )  # Separate timeout for vector operations
 
+# CLI query server (python s3ai_query.py --serve); loopback only by default
+QUERY_SERVER_HOST = os.getenv("QUERY_SERVER_HOST", "127.0.0.1")
+QUERY_SERVER_PORT = int(os.getenv("QUERY_SERVER_PORT", "8765"))
+# Server drops a client that sends nothing for this many seconds mid-query
+QUERY_SERVER_RECV_TIMEOUT = float(os.getenv("QUERY_SERVER_RECV_TIMEOUT", "5"))
+# Client gives up waiting for an answer and runs the query in-process after this.
+# The server bounds each batch's LLM stage by LLM_TIMEOUT_SECONDS, and a queued
+# client may wait out the batch in progress before its own
+QUERY_SERVER_REPLY_TIMEOUT = float(
+    os.getenv("QUERY_SERVER_REPLY_TIMEOUT", str(2 * LLM_TIMEOUT_SECONDS + 10))
+)
+# Queries arriving within the window are answered with one batched LLM call
+QUERY_SERVER_MAX_BATCH = int(os.getenv("QUERY_SERVER_MAX_BATCH", "8"))
+QUERY_SERVER_BATCH_WINDOW_MS = int(os.getenv("QUERY_SERVER_BATCH_WINDOW_MS", "20"))
+
 # Quick search settings
 QUICK_SEARCH_MAX_RESULTS = int(os.getenv("QUICK_SEARCH_MAX_RESULTS", "10"))
 QUICK_SEARCH_ENABLE_KEYWORD_FALLBACK = os.getenv(
@@ -52,3 +81,8 @@ CORS_ORIGINS = [
 ALLOW_DANGEROUS_DESERIALIZATION = (
     os.getenv("ALLOW_DANGEROUS_DESERIALIZATION", "true").lower() == "true"
 )
+# FAISS index layout written by build_embeddings_all.py:
+# "flat" (exact), "sq8" (int8), "hnsw" or "hnsw_sq8" (approximate graph search)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
@@ -3,6 +3,7 @@
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.llms import Ollama
+from langchain_core.embeddings import Embeddings
 from config import (
     VECTOR_INDEX_PATH,
     EMBED_MODEL,
@@ -11,19 +12,38 @@ from config import (
     TOP_K,
     TOP_P,
     ALLOW_DANGEROUS_DESERIALIZATION,
+    QUERY_EMBED_CACHE_SIZE,
 )
+import functools
 import time
 from utils import logger
 import threading
 import os
 
 
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes query vectors for repeat questions"""
+
+    def __init__(self, base: Embeddings, maxsize: int = QUERY_EMBED_CACHE_SIZE):
+        self.base = base
+        self._cached_query = functools.lru_cache(maxsize=maxsize)(self._encode_query)
+
+    def _encode_query(self, text: str) -> tuple:
+        return tuple(self.base.embed_query(text))
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str):
+        return list(self._cached_query(text.strip()))
+
+
 class ModelCache:
     _llm = None
     _embeddings = None
     _vector_store = None
     _load_times = {}
-    _lock = threading.Lock()
+    _lock = threading.RLock()  # get_vector_store re-enters via get_embeddings
 
     @classmethod
     def get_llm(cls):
@@ -54,10 +74,12 @@ class ModelCache:
                     # Prefer same device settings used during build for consistency
                     from config import EMBED_DEVICE, EMBED_BATCH_SIZE
 
-                    cls._embeddings = HuggingFaceEmbeddings(
-                        model_name=EMBED_MODEL,
-                        model_kwargs={"device": EMBED_DEVICE},
-                        encode_kwargs={"batch_size": EMBED_BATCH_SIZE},
+                    cls._embeddings = CachedEmbeddings(
+                        HuggingFaceEmbeddings(
+                            model_name=EMBED_MODEL,
+                            model_kwargs={"device": EMBED_DEVICE},
+                            encode_kwargs={"batch_size": EMBED_BATCH_SIZE},
+                        )
                     )
                     cls._load_times["embeddings"] = time.time() - start_time
                     logger.info(
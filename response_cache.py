@@ -1,104 +1,253 @@
 # response_cache.py - Response caching for instant answers
 
+import functools
 import hashlib
 import json
 import os
-from datetime import datetime, timedelta
-from config import CACHE_DIR, CACHE_TTL_HOURS
-import tempfile
+from collections import OrderedDict
+from config import (
+    CACHE_DIR,
+    CACHE_TTL_HOURS,
+    CACHE_MEMORY_ENTRIES,
+    CACHE_DURABLE,
+)
 import threading
+import time
+
+try:
+    import orjson  # Optional: faster (de)serialization of cache entries
+except ImportError:
+    orjson = None
+
+
+def _dumps(data: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _loads(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# Directory-fd relative sweeps (POSIX); Windows falls back to full paths
+_DIR_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)
+_DIR_FD_SWEEP = (
+    hasattr(os, "O_DIRECTORY")
+    and os.scandir in os.supports_fd
+    and os.open in os.supports_dir_fd
+    and os.unlink in os.supports_dir_fd
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _cache_key(query: str) -> str:
+    """Normalize and hash a query; memoized so get-then-set hashes once"""
+    return hashlib.blake2b(
+        query.lower().strip().encode("utf-8"), digest_size=16
+    ).hexdigest()
 
 
 class ResponseCache:
-    def __init__(self, cache_dir=CACHE_DIR, ttl_hours=CACHE_TTL_HOURS):
+    def __init__(
+        self,
+        cache_dir=CACHE_DIR,
+        ttl_hours=CACHE_TTL_HOURS,
+        memory_entries=CACHE_MEMORY_ENTRIES,
+        durable=CACHE_DURABLE,
+    ):
         self.cache_dir = cache_dir
-        self.ttl = timedelta(hours=ttl_hours)
+        self.ttl_seconds = ttl_hours * 3600.0
+        # Losing an entry on crash is harmless, so atomic writes are opt-in
+        self.durable = durable
         os.makedirs(cache_dir, exist_ok=True)
         self._lock = threading.Lock()
+        # In-process LRU in front of the disk store: key -> (file mtime, response)
+        self._mem = OrderedDict()
+        self._mem_max = memory_entries
 
     def _get_cache_key(self, query: str) -> str:
         """Generate cache key from query"""
-        return hashlib.md5(query.lower().strip().encode()).hexdigest()
+        return _cache_key(query)
+
+    def _entry_path(self, cache_key: str) -> str:
+        """Entries are sharded by the first two hex chars of the key"""
+        return os.path.join(self.cache_dir, cache_key[:2], f"{cache_key[2:]}.json")
+
+    def _iter_entries(self):
+        """Yield (DirEntry, dir_fd) for every cache file, sharded or legacy flat.
+
+        Where the platform supports it, directories are scanned through file
+        descriptors so removals are relative to an open directory instead of
+        re-resolving every path component; otherwise dir_fd is None.
+        """
+        top_fd = None
+        try:
+            if _DIR_FD_SWEEP:
+                top_fd = os.open(self.cache_dir, _DIR_FLAGS)
+            top = os.scandir(self.cache_dir if top_fd is None else top_fd)
+        except FileNotFoundError:
+            return
+        try:
+            with top:
+                for entry in top:
+                    if entry.name.endswith(".json"):
+                        yield entry, top_fd  # Written before sharding was introduced
+                    elif len(entry.name) == 2 and entry.is_dir(follow_symlinks=False):
+                        yield from self._iter_shard(entry, top_fd)
+        finally:
+            if top_fd is not None:
+                os.close(top_fd)
+
+    @staticmethod
+    def _iter_shard(shard, top_fd):
+        """Yield (DirEntry, dir_fd) for the cache files inside one shard"""
+        if top_fd is None:
+            with os.scandir(shard.path) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        yield entry, None
+            return
+        shard_fd = os.open(shard.name, _DIR_FLAGS, dir_fd=top_fd)
+        try:
+            with os.scandir(shard_fd) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        yield entry, shard_fd
+        finally:
+            os.close(shard_fd)
+
+    @staticmethod
+    def _unlink(entry, dir_fd):
+        if dir_fd is None:
+            os.remove(entry.path)
+        else:
+            os.unlink(entry.name, dir_fd=dir_fd)
+
+    @staticmethod
+    def _write_file(path: str, payload: bytes):
+        """Write payload to path, creating its shard directory on first use"""
+        try:
+            f = open(path, "wb")
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, "wb")
+        with f:
+            f.write(payload)
+
+    def _remember(self, cache_key: str, written_at: float, response: str):
+        """Store an entry in the in-memory LRU, evicting the oldest if full"""
+        if self._mem_max <= 0:
+            return
+        with self._lock:
+            self._mem[cache_key] = (written_at, response)
+            self._mem.move_to_end(cache_key)
+            while len(self._mem) > self._mem_max:
+                self._mem.popitem(last=False)
 
     def get(self, query: str):
         """Get cached response if available and not expired"""
         cache_key = self._get_cache_key(query)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
+        cache_file = self._entry_path(cache_key)
+        ttl_seconds = self.ttl_seconds
 
-        if os.path.exists(cache_file):
+        with self._lock:
+            hit = self._mem.get(cache_key)
+        if hit is not None:
+            # One stat keeps memory hits honest across processes: an entry that
+            # another worker cleared or rewrote no longer matches our mtime
             try:
-                with self._lock:
-                    with open(cache_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                cached_time = datetime.fromisoformat(data["timestamp"])
-                if datetime.now() - cached_time < self.ttl:
-                    return data["response"]
-            except Exception:
-                pass  # Ignore cache errors
-        return None
+                current = os.stat(cache_file).st_mtime
+            except OSError:
+                current = None
+            with self._lock:
+                if current == hit[0] and time.time() - current < ttl_seconds:
+                    if cache_key in self._mem:
+                        self._mem.move_to_end(cache_key)
+                    return hit[1]
+                self._mem.pop(cache_key, None)
+
+        # Open first and fstat the handle: one path lookup, no exists/open race.
+        # mtime is the entry's write time. No lock needed: a reader racing a
+        # non-durable write sees a partial file, fails to parse it and misses.
+        try:
+            with open(cache_file, "rb") as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                if time.time() - mtime >= ttl_seconds:
+                    return None
+                data = _loads(f.read())
+            response = data["response"]
+        except FileNotFoundError:
+            return None
+        except Exception:
+            return None  # Ignore cache errors
+        self._remember(cache_key, mtime, response)
+        return response
 
     def set(self, query: str, response: str, source: str = "unknown"):
         """Cache response for future use"""
         cache_key = self._get_cache_key(query)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
+        cache_file = self._entry_path(cache_key)
 
+        now = time.time()
         data = {
             "query": query,
             "response": response,
             "source": source,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now,  # Epoch seconds; TTL checks use the file mtime
         }
 
         try:
-            with self._lock:
-                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            payload = _dumps(data)
+            if self.durable:
+                # Temp name is unique per process and thread, so writers never collide
+                tmp_path = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
                 try:
-                    with os.fdopen(fd, "w", encoding="utf-8") as tmp_f:
-                        json.dump(data, tmp_f, indent=2)
+                    self._write_file(tmp_path, payload)
                     os.replace(tmp_path, cache_file)
-                finally:
-                    if os.path.exists(tmp_path):
-                        try:
-                            os.remove(tmp_path)
-                        except Exception:
-                            pass
+                except Exception:
+                    try:
+                        os.remove(tmp_path)
+                    except Exception:
+                        pass
+                    raise
+            else:
+                self._write_file(cache_file, payload)
+            mtime = os.stat(cache_file).st_mtime
         except Exception:
-            pass  # Ignore cache errors
+            return  # Ignore cache errors
+        self._remember(cache_key, mtime, response)
 
     def clear_expired(self):
         """Clear expired cache entries"""
-        if not os.path.exists(self.cache_dir):
-            return
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for key in [k for k, (t, _) in self._mem.items() if t < cutoff]:
+                del self._mem[key]
 
-        now = datetime.now()
-        for file in os.listdir(self.cache_dir):
-            if file.endswith(".json"):
-                file_path = os.path.join(self.cache_dir, file)
-                try:
+        for entry, dir_fd in self._iter_entries():
+            try:
+                # DirEntry caches the lstat result; the d_type check needs no syscall
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if entry.stat(follow_symlinks=False).st_mtime < cutoff:
                     with self._lock:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-                    cached_time = datetime.fromisoformat(data["timestamp"])
-                    if now - cached_time > self.ttl:
-                        os.remove(file_path)
-                except Exception:
-                    try:
-                        os.remove(file_path)  # Remove corrupted cache files
-                    except Exception:
-                        pass
+                        self._unlink(entry, dir_fd)
+            except Exception:
+                pass
 
     def clear_all(self):
         """Clear all cache entries"""
-        if not os.path.exists(self.cache_dir):
-            return
-        for file in os.listdir(self.cache_dir):
-            if file.endswith(".json"):
-                file_path = os.path.join(self.cache_dir, file)
-                try:
-                    with self._lock:
-                        os.remove(file_path)
-                except Exception:
-                    pass
+        with self._lock:
+            self._mem.clear()
+        for entry, dir_fd in self._iter_entries():
+            try:
+                with self._lock:
+                    self._unlink(entry, dir_fd)
+            except Exception:
+                pass
 
 
 # Global cache instance
@@ -5,92 +5,333 @@ Fast PDF search + AI formatting for vendor documentation
 Searches actual vendor docs + makes them human readable
 """
 
+import concurrent.futures
+import functools
+import queue
+import socket
 import sys
+import threading
 import time
 from pathlib import Path
 
+from config import (
+    LLM_TIMEOUT_SECONDS,
+    QUERY_SERVER_HOST,
+    QUERY_SERVER_PORT,
+    QUERY_SERVER_MAX_BATCH,
+    QUERY_SERVER_BATCH_WINDOW_MS,
+    QUERY_SERVER_RECV_TIMEOUT,
+    QUERY_SERVER_REPLY_TIMEOUT,
+)
 
-def main_query(query):
-    """Fast PDF search + AI formatting for human readability"""
+# Sent by the server on accept so the client knows it reached a query server
+_GREETING = b"S3AI-QUERY-SERVER/1\n"
+_MAX_QUERY_BYTES = 64 * 1024
+
+
+# Constant instructions come first so Ollama can reuse the prompt prefix it
+# already evaluated for the previous query
+_FORMAT_PROMPT = """CRITICAL: You are a technical documentation formatter. You must ONLY use the content provided below from vendor documentation. Do NOT add any information from your training data.
+
+TASK:
+1. Format the vendor documentation content below to be human-readable
+2. Extract and organize the relevant API endpoints and information
+3. Present it in a clear, structured way
+4. ONLY use information from the provided vendor documentation
+5. If the documentation doesn't fully answer the query, say so explicitly
+
+VENDOR DOCUMENTATION CONTENT (from PDF extraction):
+%s
+
+USER QUERY: "%s"
+
+FORMATTED RESPONSE BASED ONLY ON PROVIDED VENDOR DOCS:"""
+
+
+def _build_prompt(query, pdf_results):
+    """Strict prompt that forces the AI to use only the retrieved content"""
+    return _FORMAT_PROMPT % (pdf_results, query)
+
+
+def _format_result(query, pdf_results, answer, total_time, search_time, ai_time):
+    """Full formatted response shown to the user
+
+    answer=None means it was already streamed, so only the timing/sources
+    trailer is returned.
+    """
+    timing = f"Total time: {total_time:.2f}s (Search: {search_time:.2f}s + AI formatting: {ai_time:.2f}s)"
+    sources = f"""---
+Raw vendor documentation sources:
+{pdf_results}"""
+    if answer is None:
+        return f"""
+{timing}
+
+{sources}"""
+    return f"""Smart Search Results for '{query}'
+Source: Your actual vendor documentation
+{timing}
+
+{answer}
+
+{sources}"""
+
+
+def _search_docs(query):
+    """Fast PDF search for one query: (pdf_results, None) or (None, final result)"""
+    try:
+        from fast_pdf_search import search_pdfs_directly
+
+        pdf_results = search_pdfs_directly(query, max_results=3)
+    except Exception as e:
+        return None, f"Smart search failed: {e}"
+    if "No matches found" in pdf_results:
+        return None, pdf_results
+    return pdf_results, None
+
+
+def _finish(query, pdf_results, response, times, streamed=False):
+    """Final result for one query from its LLM response (or the error it raised)"""
+    if isinstance(response, Exception):
+        print(f"AI formatting failed: {response}")
+        return f"AI formatting failed, showing raw results:\n\n{pdf_results}"
+    answer = str(response).strip() if response else ""
+    if not answer:
+        return f"AI formatting failed. Raw results:\n\n{pdf_results}"
+    return _format_result(query, pdf_results, None if streamed else answer, *times)
+
+
+def main_query(query, stream=False):
+    """Fast PDF search + AI formatting for human readability
+
+    With stream=True the AI answer is written to stdout as it is generated and
+    only the timing/sources trailer is returned.
+    """
     print(f"Smart Search for: '{query}'")
     print("-" * 50)
+    if not stream:
+        return answer_batch([query])[0]
 
     start_time = time.time()
 
     # Step 1: Fast PDF search to get actual vendor content
+    pdf_results, result = _search_docs(query)
+    if result is not None:
+        return result
+    print("Found vendor documentation content")
+    search_time = time.time() - start_time
+
+    # Step 2: Use AI to make it human readable (but ONLY from retrieved content)
+    print("Formatting with AI (using ONLY retrieved vendor docs)...")
+    ai_start = time.time()
     try:
-        from fast_pdf_search import search_pdfs_directly
+        from model_cache import ModelCache
 
-        pdf_results = search_pdfs_directly(query, max_results=3)
+        llm = ModelCache.get_llm()
+        print()
+        print(f"Smart Search Results for '{query}'")
+        print("Source: Your actual vendor documentation")
+        print()
+        chunks = []
+        for chunk in llm.stream(_build_prompt(query, pdf_results)):
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+            chunks.append(chunk)
+        print()
+        response = "".join(chunks)
+    except Exception as e:
+        response = e
+    ai_time = time.time() - ai_start
+    times = (time.time() - start_time, search_time, ai_time)
+    return _finish(query, pdf_results, response, times, streamed=True)
 
-        if "No matches found" in pdf_results:
-            return pdf_results
 
-        print("Found vendor documentation content")
-        search_time = time.time() - start_time
+def answer_batch(queries):
+    """Answer several queries with one batched LLM call"""
+    start_time = time.time()
+    results = [None] * len(queries)
+    pending = []
 
-        # Step 2: Use AI to make it human readable (but ONLY from retrieved content)
-        print("Formatting with AI (using ONLY retrieved vendor docs)...")
+    for i, query in enumerate(queries):
+        pdf_results, results[i] = _search_docs(query)
+        if results[i] is None:
+            pending.append((i, query, pdf_results))
+    search_time = time.time() - start_time
 
+    if pending:
+        ai_start = time.time()
         try:
             from model_cache import ModelCache
+            from utils import run_with_timeout
 
             llm = ModelCache.get_llm()
+            # Bounded so the query server always replies inside the client's
+            # window; on timeout every query gets its raw results instead
+            responses = run_with_timeout(
+                functools.partial(llm.batch, return_exceptions=True),
+                [
+                    _build_prompt(query, pdf_results)
+                    for _, query, pdf_results in pending
+                ],
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+        except concurrent.futures.TimeoutError:
+            e = TimeoutError(f"LLM batch timed out after {LLM_TIMEOUT_SECONDS}s")
+            responses = [e] * len(pending)
+        except Exception as e:
+            responses = [e] * len(pending)
+        ai_time = time.time() - ai_start
+        times = (time.time() - start_time, search_time, ai_time)
 
-            # Strict prompt that forces AI to use only the provided content
-            prompt = f"""CRITICAL: You are a technical documentation formatter. You must ONLY use the content provided below from vendor documentation. Do NOT add any information from your training data.
+        for (i, query, pdf_results), response in zip(pending, responses):
+            results[i] = _finish(query, pdf_results, response, times)
 
-USER QUERY: "{query}"
+    return results
 
-VENDOR DOCUMENTATION CONTENT (from PDF extraction):
-{pdf_results}
 
-TASK: 
-1. Format the above vendor documentation content to be human-readable
-2. Extract and organize the relevant API endpoints and information
-3. Present it in a clear, structured way
-4. ONLY use information from the provided vendor documentation above
-5. If the documentation doesn't fully answer the query, say so explicitly
+def _accept_loop(server, conns):
+    """Accept and greet clients, queueing them for the batch worker
 
-FORMATTED RESPONSE BASED ONLY ON PROVIDED VENDOR DOCS:"""
+    Runs on its own thread, so clients arriving while a batch is being
+    answered are greeted at once and wait in the queue for the next batch.
+    """
+    while True:
+        try:
+            conn = server.accept()[0]
+        except OSError:
+            return  # Listening socket closed
+        # Bounds every later recv/send, so a stalled peer cannot block the server
+        conn.settimeout(QUERY_SERVER_RECV_TIMEOUT)
+        try:
+            conn.sendall(_GREETING)
+        except OSError:
+            conn.close()
+            continue
+        conns.put(conn)
+
+
+def _next_batch(conns):
+    """Wait for one queued client, then take others queued within the batch window"""
+    batch = [conns.get()]
+    deadline = time.time() + QUERY_SERVER_BATCH_WINDOW_MS / 1000
+    while len(batch) < QUERY_SERVER_MAX_BATCH:
+        remaining = deadline - time.time()
+        try:
+            if remaining > 0:
+                batch.append(conns.get(timeout=remaining))
+            else:
+                batch.append(conns.get_nowait())  # Already queued during a batch
+        except queue.Empty:
+            break
+    return batch
 
-            # Get AI response
-            ai_start = time.time()
-            response = llm.invoke(prompt)
-            ai_time = time.time() - ai_start
 
-            if response and str(response).strip():
-                total_time = time.time() - start_time
+def _recv_all(conn, limit=None) -> bytes:
+    """Read from a socket until the peer closes its write side (or limit bytes)"""
+    chunks = []
+    received = 0
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+        received += len(chunk)
+        if limit is not None and received > limit:
+            raise ValueError(f"message larger than {limit} bytes")
 
-                formatted_response = f"""Smart Search Results for '{query}'
-Source: Your actual vendor documentation
-Total time: {total_time:.2f}s (Search: {search_time:.2f}s + AI formatting: {ai_time:.2f}s)
 
-{str(response).strip()}
+def _recv_exact(conn, size: int) -> bytes:
+    """Read exactly size bytes, or fewer if the peer closes first"""
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
 
----
-Raw vendor documentation sources:
-{pdf_results}"""
 
-                return formatted_response
-            else:
-                return f"AI formatting failed. Raw results:\n\n{pdf_results}"
+def serve():
+    """Keep a warm process around so repeat CLI queries skip the cold start"""
+    print("S3 On-Premise AI Assistant - Query Server")
+    print("=" * 50)
+    print("Warming up models...")
+    import fast_pdf_search  # noqa: F401 - import once, reuse for every query
 
-        except Exception as ai_error:
-            print(f"AI formatting failed: {ai_error}")
-            return f"AI formatting failed, showing raw results:\n\n{pdf_results}"
+    try:
+        from model_cache import ModelCache
 
+        ModelCache.get_llm()
     except Exception as e:
-        return f"Smart search failed: {e}"
+        print(f"LLM warm-up failed (will retry per query): {e}")
+
+    with socket.create_server((QUERY_SERVER_HOST, QUERY_SERVER_PORT)) as server:
+        print(f"Listening on {QUERY_SERVER_HOST}:{QUERY_SERVER_PORT} (Ctrl+C to stop)")
+        conns = queue.Queue()
+        threading.Thread(target=_accept_loop, args=(server, conns), daemon=True).start()
+        try:
+            while True:
+                batch = []
+                for conn in _next_batch(conns):
+                    try:
+                        raw = _recv_all(conn, _MAX_QUERY_BYTES)
+                    except (OSError, ValueError) as e:
+                        print(f"Dropping client: {e}")
+                        conn.close()
+                        continue
+                    query = raw.decode("utf-8", "replace").strip()
+                    if query:
+                        batch.append((conn, query))
+                    else:
+                        conn.close()
+                if not batch:
+                    continue
+                print(f"Answering batch of {len(batch)} queries")
+                results = answer_batch([query for _, query in batch])
+                for (conn, _), result in zip(batch, results):
+                    with conn:
+                        try:
+                            conn.sendall(result.encode("utf-8"))
+                        except OSError:
+                            pass  # Client gave up waiting
+        except KeyboardInterrupt:
+            print("Query server stopped")
+
+
+def query_server(query):
+    """Forward a query to a running query server; None if none answered"""
+    try:
+        conn = socket.create_connection(
+            (QUERY_SERVER_HOST, QUERY_SERVER_PORT), timeout=0.5
+        )
+    except OSError:
+        return None
+    with conn:
+        try:
+            # Anything else listening on the port will not send the greeting
+            if _recv_exact(conn, len(_GREETING)) != _GREETING:
+                return None
+            conn.sendall(query.encode("utf-8"))
+            conn.shutdown(socket.SHUT_WR)
+            conn.settimeout(QUERY_SERVER_REPLY_TIMEOUT)  # LLM formatting takes a while
+            reply = _recv_all(conn)
+        except OSError:
+            return None
+        return reply.decode("utf-8", "replace") if reply else None
 
 
 def main():
     if len(sys.argv) < 2:
         print("Usage: python s3ai_query.py <your-question>")
+        print("       python s3ai_query.py --serve   (keep models warm)")
         print('Example: python s3ai_query.py "bucketops"')
         print('Example: python s3ai_query.py "how to purge bucket in cloudian"')
         return
 
+    if sys.argv[1] == "--serve":
+        serve()
+        return
+
     query = " ".join(sys.argv[1:])
 
     print("S3 On-Premise AI Assistant")
@@ -99,7 +340,9 @@ def main():
     print("Fast PDF search + AI formatting")
     print()
 
-    result = main_query(query)
+    result = query_server(query)
+    if result is None:
+        result = main_query(query, stream=True)
     print(result)
 
 
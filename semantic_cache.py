@@ -0,0 +1,140 @@
+# semantic_cache.py - Match near-duplicate questions to cached answers
+
+import os
+import threading
+import numpy as np
+from config import (
+    CACHE_DIR,
+    SEMANTIC_CACHE,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+)
+from response_cache import response_cache
+from utils import logger
+
+
+class SemanticCache:
+    """Nearest-neighbour index of past questions over normalized embeddings.
+
+    Only questions and their vectors are kept here; answers stay in
+    response_cache, so TTL expiry and cache clears apply to semantic hits too.
+    Vectors live in a preallocated ring, so recording a question writes one
+    row instead of copying the whole matrix.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "semantic_index.npz"),
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._queries = []  # Ring slots, parallel to the rows of _vectors
+        self._vectors = None  # (max_entries, dim) float32, rows L2-normalized
+        self._count = 0  # Filled slots
+        self._next = 0  # Slot the next question is written to
+        self._load()
+
+    def _append(self, query: str, vector: np.ndarray):
+        """Record a question in the ring, overwriting the oldest once full"""
+        if self._vectors is None:
+            self._vectors = np.empty(
+                (self.max_entries, vector.shape[0]), dtype=np.float32
+            )
+        self._vectors[self._next] = vector
+        if self._count < self.max_entries:
+            self._queries.append(query)
+            self._count += 1
+        else:
+            self._queries[self._next] = query
+        self._next = (self._next + 1) % self.max_entries
+
+    def _load(self):
+        # Plain arrays only: nothing from the shared cache dir is unpickled
+        try:
+            with np.load(self.path, allow_pickle=False) as state:
+                queries = state["queries"].tolist()
+                vectors = state["vectors"]
+            if len(queries) != len(vectors):
+                raise ValueError("questions and vectors differ in length")
+            for query, vector in zip(queries[-self.max_entries :], vectors):
+                self._append(query, vector)
+            logger.info(f"Semantic cache loaded: {self._count} questions")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Semantic cache not loaded: {e}")
+
+    def save(self):
+        """Persist the question index next to the response cache"""
+        with self._lock:
+            if not self._count:
+                return
+            # Oldest first, so a smaller max_entries keeps the newest on load
+            order = np.roll(np.arange(self._count), -self._next % self._count)
+            queries = np.array([self._queries[i] for i in order])
+            vectors = self._vectors[order]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Temp name is unique per process and thread, so API workers never collide
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, queries=queries, vectors=vectors)
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._queries = []
+            self._vectors = None
+            self._count = 0
+            self._next = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _embed(query: str) -> np.ndarray:
+        from model_cache import ModelCache
+
+        vector = np.asarray(
+            ModelCache.get_embeddings().embed_query(query), dtype=np.float32
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, query: str):
+        """Cached answer for a similar earlier question, else None.
+
+        A miss records the question so later paraphrases can find its answer
+        once it has been cached.
+        """
+        vector = self._embed(query)
+        with self._lock:
+            best, score = None, -1.0
+            if self._count:
+                scores = self._vectors[: self._count] @ vector
+                idx = int(np.argmax(scores))
+                best, score = self._queries[idx], float(scores[idx])
+            if score < 0.999:  # Not already indexed
+                self._append(query, vector)
+
+        if best is not None and best != query and score >= self.threshold:
+            cached = response_cache.get(best)
+            if cached:
+                logger.info(f"Semantic cache hit ({score:.3f}): '{best}'")
+                return cached
+        return None
+
+
+# Global semantic cache (None unless SEMANTIC_CACHE is enabled)
+semantic_cache = SemanticCache() if SEMANTIC_CACHE else None
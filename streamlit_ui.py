@@ -3,13 +3,57 @@
 import streamlit as st
 import time
 import os
-from model_cache import ModelCache
+import sys
+import logging
 from response_cache import response_cache
-from bucket_index import bucket_index
-from langchain.chains import RetrievalQA
-from utils import logger, search_in_fallback_text, load_txt_documents
 from config import VECTOR_SEARCH_K, RECENT_QUESTIONS_FILE, DOCS_PATH
 
+# model_cache, bucket_index and utils pull in LangChain and the ML stack; they
+# are imported where a query first needs them so the idle UI paints quickly.
+# Logging is set up here as utils does, since utils may not be imported yet
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource(show_spinner=False)
+def _llm():
+    """Shared LLM client, resolved once across reruns"""
+    from model_cache import ModelCache
+
+    return ModelCache.get_llm()
+
+
+@st.cache_resource(show_spinner=False)
+def _vector_store():
+    """Shared vector store; failures raise, so they are retried rather than cached"""
+    import concurrent.futures
+    from model_cache import ModelCache
+    from utils import run_with_timeout
+
+    # Try to load vector store with 30 second timeout
+    try:
+        vector_store = run_with_timeout(ModelCache.get_vector_store, timeout=30)
+    except concurrent.futures.TimeoutError:
+        raise TimeoutError(
+            "Vector store loading timed out after 30 seconds. Index may be too large."
+        )
+    if vector_store is None:
+        raise RuntimeError(
+            "Vector store not available - please run 'python build_embeddings_all.py' after uploading documents"
+        )
+    return vector_store
+
+
+@st.cache_resource(show_spinner=False)
+def _qa_chain(k: int):
+    """RetrievalQA chain over the shared LLM and vector store, built once per k"""
+    from langchain.chains import RetrievalQA
+
+    # The vector store is loaded with a timeout to prevent hanging in Streamlit
+    retriever = _vector_store().as_retriever(search_kwargs={"k": k})
+    return RetrievalQA.from_chain_type(llm=_llm(), retriever=retriever)
+
+
 # Enterprise page configuration
 st.set_page_config(
     page_title="S3 On-Premise AI Assistant",
@@ -268,7 +312,9 @@ st.markdown(
 st.markdown('<div class="enterprise-card">', unsafe_allow_html=True)
 st.markdown("###  System Performance")
 
-perf = ModelCache.get_load_times()
+# Nothing has been loaded (and no load times exist) until model_cache is imported
+_model_cache = sys.modules.get("model_cache")
+perf = _model_cache.ModelCache.get_load_times() if _model_cache else {}
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
@@ -382,9 +428,13 @@ with st.expander("📁 Data Management", expanded=False):
             with st.spinner("Rebuilding knowledge base..."):
                 try:
                     from build_embeddings_all import build_vector_index
+                    from model_cache import ModelCache
 
                     build_vector_index()
                     ModelCache.reset_vector_store()
+                    _vector_store.clear()
+                    _qa_chain.clear()
+                    st.session_state.pop("fallback_index", None)
                     ModelCache.get_vector_store()
                     st.success(" Knowledge base successfully updated")
                 except Exception as e:
@@ -396,13 +446,12 @@ if clear_cache:
     st.success(" Cache cleared successfully")
 
 # Initialize query history
-if "query_history" not in st.session_state:
-    st.session_state.query_history = []
+history = st.session_state.setdefault("query_history", [])
 
 # Query Processing
 if (submit or fast_search) and query:
     start_time = time.time()
-    st.session_state.query_history.append(query)
+    history.append(query)
 
     # Compact progress indicators
     progress_container = st.container()
@@ -434,6 +483,15 @@ if (submit or fast_search) and query:
                 st.markdown("**Source:** Cache hit")
                 st.markdown(f"**Response time:** {rt:.2f} seconds")
         else:
+            from bucket_index import bucket_index
+            from utils import (
+                search_in_fallback_text,
+                load_txt_documents,
+                FallbackTextIndex,
+                QUICK_PROMPT,
+                FALLBACK_PROMPT,
+            )
+
             # Quick search
             progress_bar.progress(30)
             status_text.markdown(" **Performing quick bucket search...**")
@@ -442,21 +500,14 @@ if (submit or fast_search) and query:
             if quick_result:
                 progress_bar.progress(60)
                 status_text.markdown(" **Processing with AI...**")
-                llm = ModelCache.get_llm()
-                prompt = f"""Based on this bucket information:
-{quick_result}
-
-Question: {query}
-Answer:"""
+                llm = _llm()
+                prompt = QUICK_PROMPT % (quick_result, query)
                 try:
                     use_ai_format = st.session_state.get("use_ai_format", False)
                     if use_ai_format:
-                        import concurrent.futures
-                        from config import LLM_TIMEOUT_SECONDS
+                        from utils import call_llm_with_retry
 
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                            fut = ex.submit(llm, prompt)
-                            answer = fut.result(timeout=LLM_TIMEOUT_SECONDS)
+                        answer = call_llm_with_retry("ui_quick_search", llm, prompt)
                     else:
                         answer = quick_result
 
@@ -501,7 +552,11 @@ Answer:"""
                     # Skip vector search, go directly to text fallback
                     progress_bar.progress(90)
                     status_text.markdown(" **Fast text search...**")
-                    fallback_text = load_txt_documents()
+                    if "fallback_index" not in st.session_state:
+                        st.session_state.fallback_index = FallbackTextIndex(
+                            load_txt_documents()
+                        )
+                    fallback_text = st.session_state.fallback_index
 
                     if fallback_text:
                         relevant_context = search_in_fallback_text(query, fallback_text)
@@ -535,41 +590,15 @@ Answer:"""
                     progress_bar.progress(50)
                     status_text.markdown(" **Performing vector search...**")
                     try:
-                        # Add timeout to prevent hanging in Streamlit
-                        import concurrent.futures
-
-                        def load_vector_store():
-                            return ModelCache.get_vector_store()
-
-                        # Try to load vector store with 30 second timeout
-                        with concurrent.futures.ThreadPoolExecutor(
-                            max_workers=1
-                        ) as executor:
-                            future = executor.submit(load_vector_store)
-                            try:
-                                vector_store = future.result(
-                                    timeout=30
-                                )  # 30 second timeout
-                            except concurrent.futures.TimeoutError:
-                                raise TimeoutError(
-                                    "Vector store loading timed out after 30 seconds. Index may be too large."
-                                )
-
-                        retriever = vector_store.as_retriever(
-                            search_kwargs={"k": VECTOR_SEARCH_K}
-                        )
-                        llm = ModelCache.get_llm()
-                        qa_chain = RetrievalQA.from_chain_type(
-                            llm=llm, retriever=retriever
-                        )
+                        qa_chain = _qa_chain(VECTOR_SEARCH_K)
 
                         progress_bar.progress(80)
                         status_text.markdown(" **AI processing...**")
-                        from config import LLM_TIMEOUT_SECONDS
+                        from utils import call_llm_with_retry
 
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                            fut = ex.submit(qa_chain.run, query)
-                            response = fut.result(timeout=LLM_TIMEOUT_SECONDS)
+                        response = call_llm_with_retry(
+                            "ui_vector_qa", qa_chain.run, query
+                        )
 
                         if response and response.strip():
                             progress_bar.progress(100)
@@ -606,35 +635,47 @@ Answer:"""
                         # Fallback search
                         progress_bar.progress(90)
                         status_text.markdown(" **Fallback search...**")
-                        fallback_text = load_txt_documents()
+                        if "fallback_index" not in st.session_state:
+                            st.session_state.fallback_index = FallbackTextIndex(
+                                load_txt_documents()
+                            )
+                        fallback_text = st.session_state.fallback_index
 
                         if fallback_text:
                             relevant_context = search_in_fallback_text(
                                 query, fallback_text
                             )
                             if relevant_context:
-                                llm = ModelCache.get_llm()
-                                prompt = f"""Based on this information:
-{relevant_context}
-
-Question: {query}
-Answer:"""
+                                llm = _llm()
+                                prompt = FALLBACK_PROMPT % (relevant_context, query)
+                                st.markdown(
+                                    '<div class="enterprise-card">',
+                                    unsafe_allow_html=True,
+                                )
+                                status_slot = st.empty()
+                                st.markdown("---")
+                                answer_slot = st.empty()
                                 try:
-                                    result = llm(prompt)
+                                    # Render tokens as they arrive instead of waiting for the full answer,
+                                    # redrawing at most every 100 ms: each redraw re-sends the whole text
+                                    chunks = []
+                                    last_draw = 0.0
+                                    for chunk in llm.stream(prompt):
+                                        chunks.append(chunk)
+                                        now = time.time()
+                                        if now - last_draw >= 0.1:
+                                            answer_slot.markdown("".join(chunks))
+                                            last_draw = now
+                                    result = "".join(chunks)
+                                    answer_slot.markdown(result)
+
                                     progress_bar.progress(100)
                                     status_text.empty()
                                     rt = time.time() - start_time
-
-                                    st.markdown(
-                                        '<div class="enterprise-card">',
-                                        unsafe_allow_html=True,
-                                    )
-                                    st.markdown(
+                                    status_slot.markdown(
                                         f'<div class="status-indicator status-info"> Fallback Search • {rt:.2f}s</div>',
                                         unsafe_allow_html=True,
                                     )
-                                    st.markdown("---")
-                                    st.markdown(result)
                                     st.markdown("</div>", unsafe_allow_html=True)
 
                                     response_cache.set(query, result, "txt_fallback")
@@ -648,18 +689,16 @@ Answer:"""
                                 except Exception as llm_error:
                                     progress_bar.progress(100)
                                     status_text.empty()
+                                    # Drop any partial answer, then reuse the card for the raw context
+                                    answer_slot.empty()
+                                    status_slot.empty()
                                     rt = time.time() - start_time
 
-                                    st.markdown(
-                                        '<div class="enterprise-card">',
-                                        unsafe_allow_html=True,
-                                    )
-                                    st.markdown(
+                                    status_slot.markdown(
                                         f'<div class="status-indicator status-warning">⚠️ Raw Content • {rt:.2f}s</div>',
                                         unsafe_allow_html=True,
                                     )
-                                    st.markdown("---")
-                                    st.code(relevant_context)
+                                    answer_slot.code(relevant_context)
                                     st.markdown("</div>", unsafe_allow_html=True)
                                     logger.error(f"LLM error in fallback: {llm_error}")
                             else:
@@ -684,10 +723,10 @@ Answer:"""
         logger.error(f"Unexpected error: {e}")
 
 # Compact Query History
-if st.session_state.query_history:
+if history:
     st.markdown('<div class="enterprise-card">', unsafe_allow_html=True)
     st.markdown("### 📝 Recent Queries")
-    for i, hist_query in enumerate(reversed(st.session_state.query_history[-3:])):
+    for i, hist_query in enumerate(reversed(history[-3:])):
         st.markdown(
             f'<div class="query-history"> {hist_query}</div>', unsafe_allow_html=True
         )
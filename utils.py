@@ -5,13 +5,29 @@ import json
 import logging
 import time
 import functools
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
+import bisect
+import collections
+import concurrent.futures
 from langchain_core.documents import Document
-from config import DOCS_PATH, FLATTENED_TXT_PATH
+from config import DOCS_PATH, FLATTENED_TXT_PATH, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Prompt templates shared by the API and the Streamlit UI, filled with
+# % (context, question)
+QUICK_PROMPT = """Based on this bucket information:
+%s
+
+Question: %s
+Answer:"""
+
+FALLBACK_PROMPT = """Based on this information:
+%s
+
+Question: %s
+Answer:"""
+
 
 def timing_decorator(func):
     """Decorator to measure function execution time"""
@@ -27,9 +43,93 @@ def timing_decorator(func):
     return wrapper
 
 
+# One worker pool for every timeout-bounded call instead of a new thread per call
+_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="s3ai")
+# Recent successful LLM latencies, kept per call site: a short quick-search
+# prompt and a full RetrievalQA run have very different latency profiles
+_llm_latencies = collections.defaultdict(lambda: collections.deque(maxlen=64))
+
+
+def run_with_timeout(func, *args, timeout: float):
+    """Run func on the shared pool; raises concurrent.futures.TimeoutError"""
+    future = _executor.submit(func, *args)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def _attempt_timeout(name: str, remaining: float) -> float:
+    """Per-attempt deadline: just above the recent p95 latency of this call site"""
+    latencies = _llm_latencies[name]
+    if len(latencies) < 8:
+        return remaining
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    return min(remaining, max(1.0, p95 * 1.2))
+
+
+def call_llm_with_retry(
+    name: str,
+    func,
+    *args,
+    timeout: float = LLM_TIMEOUT_SECONDS,
+    retries: int = LLM_MAX_RETRIES,
+):
+    """Run an LLM call, re-issuing it if it lands in the latency tail
+
+    name identifies the call site whose latency history sets the hedge point;
+    only successful calls are recorded. Earlier attempts stay eligible, so
+    whichever succeeds first wins, and an attempt that fails while another is
+    still running does not end the call. The whole call never takes longer
+    than timeout; raises concurrent.futures.TimeoutError, or the error of the
+    last attempt once none is left running.
+    """
+    deadline = time.time() + timeout
+    pending = {}
+    for attempt in range(retries + 1):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        if attempt < retries:
+            remaining = _attempt_timeout(name, remaining)
+        pending[_executor.submit(func, *args)] = time.time()
+        attempt_deadline = time.time() + remaining
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=max(0.0, attempt_deadline - time.time()),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                started = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                _llm_latencies[name].append(time.time() - started)
+                for other in pending:
+                    other.cancel()
+                return result
+        if not pending:
+            raise error
+        logger.warning(
+            f"LLM call '{name}' exceeded {remaining:.1f}s (attempt {attempt + 1}/{retries + 1})"
+        )
+    for future in pending:
+        future.cancel()
+    raise concurrent.futures.TimeoutError(f"LLM call timed out after {timeout}s")
+
+
 @timing_decorator
 def load_documents_from_path(path: str = DOCS_PATH) -> list[Document]:
     """Load documents from various file types in the specified path"""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
     docs = []
 
     if not os.path.exists(path):
@@ -214,10 +314,55 @@ def count_uploadable_documents() -> int:
     return len(real_docs)
 
 
-def search_in_fallback_text(query: str, text: str, max_results: int = 10) -> str:
-    """Search for query in fallback text and return relevant context"""
+class FallbackTextIndex:
+    """Fallback text split and lowercased once, for repeated substring searches"""
+
+    def __init__(self, text: str):
+        self.lines = text.split("\n") if text else []
+        # lower() can change a line's length, so offsets come from the lowered text
+        lowered = [line.lower() for line in self.lines]
+        self.line_starts = []
+        offset = 0
+        for line_lower in lowered:
+            self.line_starts.append(offset)
+            offset += len(line_lower) + 1
+        self.text_lower = "\n".join(lowered)
+
+    def __bool__(self) -> bool:
+        return bool(self.text_lower)
+
+    def find_lines(self, query: str, limit: int) -> list:
+        """Indices of up to limit lines containing query (case-insensitive)"""
+        query_lower = query.lower()
+        if "\n" in query_lower:
+            return []  # A line can never contain a newline
+
+        text = self.text_lower
+        found = []
+        pos = text.find(query_lower)
+        while pos != -1 and len(found) < limit:
+            i = bisect.bisect_right(self.line_starts, pos) - 1
+            found.append(i)
+            if i + 1 >= len(self.line_starts):
+                break
+            pos = text.find(query_lower, self.line_starts[i + 1])
+        return found
+
+    def search(self, query: str, max_results: int = 10) -> str:
+        """Same matches as search_in_fallback_text, found with str.find"""
+        matching_lines = [
+            f"Line {i+1}: {self.lines[i].strip()}"
+            for i in self.find_lines(query, max_results)
+        ]
+        return "\n".join(matching_lines) if matching_lines else ""
+
+
+def search_in_fallback_text(query: str, text, max_results: int = 10) -> str:
+    """Search for query in fallback text (str or FallbackTextIndex) and return relevant context"""
     if not text:
         return ""
+    if isinstance(text, FallbackTextIndex):
+        return text.search(query, max_results)
 
     query_lower = query.lower()
     lines = text.split("\n")